@@ -1,6 +1,10 @@
 
 import os
 import json
+import asyncio
+import functools
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -18,11 +22,26 @@ class CommandResponse(BaseModel):
     codeBlock: Optional[str] = None
     codeAnalysis: Optional[List[dict]] = None
 
+class AgentFindings(BaseModel):
+    summary: str
+    details: str
+
+class AnalysisContext(BaseModel):
+    # the only state handed between agents: the request plus each specialist's summary
+    command: str
+    context: dict = {}
+    code_summary: Optional[str] = None
+    test_summary: Optional[str] = None
+
+@functools.lru_cache(maxsize=1)
 def get_llm():
     api_key = os.getenv("GOOGLE_API_KEY", "")
-    return ChatGoogleGenerativeAI(model="gemini-", google_api_key=api_key)
+    # bounded timeout + retries so a stalled Gemini call can't pin a request
+    return ChatGoogleGenerativeAI(model="gemini-", google_api_key=api_key, timeout=60, max_retries=2)
 
 def create_github_crew():
+    # Crew.kickoff mutates its agents (crew, agent_executor), so every request
+    # gets fresh ones; only the LLM client behind them is shared
     llm = get_llm()
     
     # Code Expert Agent
@@ -53,3 +72,78 @@ def create_github_crew():
     )
     
     return code_expert, github_ops, test_expert
+
+async def _warm_llm() -> None:
+    # build the client and pay the TLS/HTTP2 handshake before the first /command does;
+    # countTokens goes over the same channel but isn't a billed generation. It runs
+    # in the background task, so it's allowed to finish instead of being cut off.
+    try:
+        llm = await asyncio.to_thread(get_llm)
+        await asyncio.to_thread(llm.get_num_tokens, "ping")
+    except Exception as e:
+        logging.warning(f"LLM warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = asyncio.create_task(_warm_llm())
+    yield
+    warmup.cancel()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+def specialist_task(agent: Agent, ctx: AnalysisContext) -> Task:
+    return Task(
+        description=(
+            f"User command: {ctx.command}\n\n"
+            f"Context:\n{json.dumps(ctx.context, indent=2)}"
+        ),
+        expected_output=f"The {agent.role}'s findings: a short summary plus supporting details.",
+        output_pydantic=AgentFindings,
+        agent=agent,
+    )
+
+def github_ops_task(agent: Agent, ctx: AnalysisContext) -> Task:
+    # only the specialists' summaries are re-prompted, not their full transcripts
+    return Task(
+        description=(
+            f"User command: {ctx.command}\n\n"
+            f"Code review summary: {ctx.code_summary}\n"
+            f"Test review summary: {ctx.test_summary}\n\n"
+            "Decide the GitHub operations to perform and in what order."
+        ),
+        expected_output="A short summary of the plan plus the exact git operations.",
+        output_pydantic=AgentFindings,
+        agent=agent,
+    )
+
+async def run_agent(agent: Agent, task: Task) -> AgentFindings:
+    crew = Crew(agents=[agent], tasks=[task], process=Process.sequential)
+    result = await asyncio.to_thread(crew.kickoff)
+    return result.pydantic or AgentFindings(summary=result.raw, details=result.raw)
+
+@app.post("/command", response_model=CommandResponse)
+async def handle_command(req: CommandRequest) -> CommandResponse:
+    code_expert, github_ops, test_expert = create_github_crew()
+    ctx = AnalysisContext(command=req.command, context=req.context or {})
+    try:
+        # code and test review read the same input independently: run them side by side,
+        # then hand github_ops just their summaries
+        code, test = await asyncio.gather(
+            run_agent(code_expert, specialist_task(code_expert, ctx)),
+            run_agent(test_expert, specialist_task(test_expert, ctx)),
+        )
+        ctx.code_summary, ctx.test_summary = code.summary, test.summary
+        ops = await run_agent(github_ops, github_ops_task(github_ops, ctx))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Agent run failed: {e}")
+    analysis = [
+        {"agent": agent.role, **findings.model_dump()}
+        for agent, findings in ((code_expert, code), (test_expert, test), (github_ops, ops))
+    ]
+    return CommandResponse(message=ops.summary, status="success", codeAnalysis=analysis)
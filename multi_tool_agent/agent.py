@@ -1,235 +1,1215 @@
 import os
+import re
+import asyncio
 import subprocess
 import logging
-from google.adk.agents import Agent, LlmAgent
-from google.adk.tools.agent_tool import AgentTool
-import json
-from pydantic import BaseModel
 import json
+import shlex
+import shutil
+import mmap
+import functools
+import signal
+import threading
 import socket
+import time
+from itertools import islice
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pygit2
+except ImportError:  # optional: fall back to the git CLI
+    pygit2 = None
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is fine, just slower
+    orjson = None
 # ——— Setup & Context ———
 logging.basicConfig(level=logging.INFO)
 
+@dataclass(slots=True)
 class RepoContext:
     path: str | None = None
-# Define the structure of the input
-class DockerfileInput(BaseModel):
-    file: str
-    summary: str
-    imports: list[str]
-    requirements: list[str]
+    repo: "pygit2.Repository | None" = None
+    refresher: "asyncio.Task | None" = None  # background status refresher
+    git_dir: str | None = None  # resolved once so git skips repository discovery
+    git_env: dict | None = None  # curated env for local read-only git
+    git_write_env: dict | None = None  # full session env for writes, pushes and hooks
+    git_memo: dict = field(default_factory=dict)  # (args, repo state) -> output
+    context_cache: list | None = None  # parsed context.jsonl records, loaded on first use
+    structure_cache: tuple | None = None  # (watched paths, stamp, describe_structure output)
+    # files the tools write, resolved once per set_repo_path
+    readme_path: str | None = None
+    context_path: str | None = None
+    legacy_context_path: str | None = None
+    dockerfile_path: str | None = None
 repo_context = RepoContext()
 
-def run_git_command(*args: str) -> str:
+# blocking directory scans run here so independent tool calls can overlap them
+_FS_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fs-scan")
+
+async def _in_fs_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_FS_POOL, fn, *args)
+
+# pygit2 calls (worktree scans, checkouts, walks) block for as long as git would;
+# they run off the event loop on one thread, since a Repository isn't thread-safe
+_REPO_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pygit2")
+
+async def _in_repo_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_REPO_POOL, fn, *args)
+
+# ——— Listing filters ———
+# shared by every listing tool; built once instead of per call
+_EXCLUDED_DIRS = frozenset({'.env', 'env', 'venv', '.venv', '__pycache__'})
+_EXCLUDED_FILES = frozenset({'README.md', '.env'})
+_ROOT_EXCLUDED = _EXCLUDED_DIRS | _EXCLUDED_FILES
+_FILES_HEADER = "📁 Files:\n"
+_ALL_FILES_HEADER = "📄 Files:\n"
+
+def _bullets(items) -> str:
+    return "\n".join("- " + i for i in items)
+
+# ——— Status & listing caches ———
+# Back-to-back status reads inside one agent turn share a single git scan, and a
+# background task keeps the cache warm between turns (gitstatusd-style).
+_STATUS_TTL = 1.0
+_STATUS_REFRESH = 2.0
+_READ_ONLY_GIT = frozenset({"status", "log", "diff", "show", "branch", "rev-parse", "ls-files", "for-each-ref"})
+_BRANCH_LIST_FLAGS = frozenset({"-a", "--all", "-r", "--remotes", "-l", "--list", "-v", "-vv", "--show-current"})
+
+def _writes_output_file(args) -> bool:
+    # diff/log/show --output=<file> (or an abbreviation of it) writes to disk
+    for a in args:
+        if a == "--":
+            return False
+        if a.startswith("--ou"):
+            return True
+    return False
+
+def _is_read_only(args) -> bool:
+    if not args or args[0] not in _READ_ONLY_GIT or _writes_output_file(args[1:]):
+        return False
+    # `branch` both lists and mutates (-d, -m, new names); only listing is a read
+    return args[0] != "branch" or all(a in _BRANCH_LIST_FLAGS for a in args[1:])
+_status_cache: dict[str, tuple[float, str]] = {}  # kind -> (expires_at, output)
+_files_cache: dict = {"mtime": None, "val": None}  # rendered list_repo_files output
+_cache_gen = 0  # bumped on every invalidation so in-flight reads can't store stale data
+
+def _store_status(kind: str, gen: int, val: str, ttl: float = _STATUS_TTL) -> None:
+    if gen == _cache_gen and not val.startswith("[ERROR]"):
+        _status_cache[kind] = (time.monotonic() + ttl, val)
+
+async def _cached_status(kind: str, read) -> str:
+    hit = _status_cache.get(kind)
+    if hit and time.monotonic() < hit[0]:
+        return hit[1]
+    gen = _cache_gen
+    val = await read()
+    _store_status(kind, gen, val)
+    return val
+
+def _invalidate_caches() -> None:
+    global _cache_gen
+    _cache_gen += 1
+    _status_cache.clear()
+    _files_cache["mtime"] = None
+    repo_context.git_memo.clear()
+    repo_context.structure_cache = None
+
+async def _refresh_status(kind: str, read) -> None:
+    gen = _cache_gen
+    try:
+        # valid until the next tick can replace it (sleep + a scan of up to _STATUS_TTL),
+        # so reads between ticks stay warm; writes still invalidate through _cache_gen
+        _store_status(kind, gen, await read(), _STATUS_REFRESH + _STATUS_TTL)
+    except Exception as e:
+        logging.warning(f"status refresh failed: {e}")
+
+async def _status_refresher() -> None:
+    while True:
+        await asyncio.sleep(_STATUS_REFRESH)
+        # get_status reads "status", recommend_action "porcelain": keep both warm.
+        # The CLI scan and the pygit2 scan (on _REPO_POOL) overlap.
+        await asyncio.gather(_refresh_status("porcelain", _read_porcelain),
+                             _refresh_status("status", _read_status))
+
+# bounds concurrent children so fan-out can't exhaust fds/process slots
+_SPAWN_LIMIT = asyncio.Semaphore(4)
+
+async def _spawn(*argv: str, env: dict | None = None) -> tuple[int, str, str]:
+    # non-blocking exec: independent tool calls can overlap their child processes
+    async with _SPAWN_LIMIT:
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            cwd=repo_context.path, env=env
+        )
+        out, err = await proc.communicate()
+    return proc.returncode, out.decode(errors="replace").strip(), err.decode(errors="replace").strip()
+
+# per-call config: reuse the untracked-file cache; GIT_OPTIONAL_LOCKS in the env
+# keeps read-only commands (and the background refresher) off index.lock
+_GIT_OPTS = ("-c", "core.untrackedCache=true")
+
+# read-only git children get a small env built once instead of the whole
+# session environment. Anything that writes, runs hooks or talks to a remote
+# (credential helpers, gh tokens, CA bundles, virtualenvs) gets os.environ.
+_GIT_PASSTHROUGH = (
+    "PATH", "HOME", "USER", "LOGNAME", "TMPDIR", "SYSTEMROOT", "USERPROFILE", "APPDATA",
+    "SSH_AUTH_SOCK", "SSH_AGENT_PID", "SSH_ASKPASS", "GIT_SSH", "GIT_SSH_COMMAND", "GIT_ASKPASS",
+    "GIT_AUTHOR_NAME", "GIT_AUTHOR_EMAIL", "GIT_COMMITTER_NAME", "GIT_COMMITTER_EMAIL", "EMAIL",
+    "GIT_CONFIG_GLOBAL", "GIT_CONFIG_NOSYSTEM", "XDG_CONFIG_HOME", "GNUPGHOME", "GPG_TTY",
+    "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY", "http_proxy", "https_proxy", "no_proxy",
+)
+_GIT_BASE_ENV = {k: os.environ[k] for k in _GIT_PASSTHROUGH if k in os.environ}
+_GIT_BASE_ENV.update(
+    LANG="C.UTF-8", LC_ALL="C.UTF-8",  # stable English output, no locale collation
+    GIT_TERMINAL_PROMPT="0",  # fail instead of hanging on a credential prompt
+    GIT_OPTIONAL_LOCKS="0",
+)
+_GIT_MEMO_MAX = 64
+
+def _repo_state() -> tuple | None:
+    # (HEAD sha, index mtime) without spawning git; None when it can't be read cheaply
+    git_dir = repo_context.git_dir
+    if git_dir is None:
+        return None
+    try:
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as f:
+            head = f.read().strip()
+        if head.startswith("ref: "):
+            with open(os.path.join(git_dir, head[5:]), encoding="utf-8") as f:
+                head = f.read().strip()
+        index_mtime = os.stat(os.path.join(git_dir, "index")).st_mtime_ns
+    except OSError:  # unborn branch, packed ref, no index yet
+        return None
+    return head, index_mtime
+
+# reads run concurrently (bounded by _SPAWN_LIMIT); anything that can touch
+# the index, refs or worktree is serialized so two writes never race on index.lock
+_GIT_WRITE_LOCK = asyncio.Lock()
+
+async def run_git_command(*args: str, memo: bool = False) -> str:
+    # memo=True only for output fully determined by HEAD + index (e.g. `log` of HEAD)
     if not repo_context.path:
         return "[ERROR] Repo path not set. Call set_repo_path() first."
+    if _is_read_only(args):
+        return await _run_git(args, memo)
+    async with _GIT_WRITE_LOCK:
+        return await _run_git(args, memo)
+
+async def _run_git(args: tuple[str, ...], memo: bool = False) -> str:
+    key = (args, _repo_state()) if memo else None
+    if key is not None and key[1] is not None and key in repo_context.git_memo:
+        return repo_context.git_memo[key]
     try:
         logging.info(f"git {' '.join(args)} @ {repo_context.path}")
-        out = subprocess.run(
-            ["git", *args],
-            capture_output=True, text=True, check=True,
-            cwd=repo_context.path
-        ).stdout.strip()
+        env = repo_context.git_env if _is_read_only(args) else repo_context.git_write_env
+        code, out, err = await _spawn("git", *_GIT_OPTS, *args, env=env)
+        if code != 0:
+            return f"[ERROR] {err or out}"
+        out = out or "[OK] Command succeeded."
+        if key is not None and key[1] is not None:
+            if len(repo_context.git_memo) >= _GIT_MEMO_MAX:
+                repo_context.git_memo.pop(next(iter(repo_context.git_memo)))
+            repo_context.git_memo[key] = out
+        return out
+    finally:
+        if not _is_read_only(args):
+            _invalidate_caches()
+
+async def git_call_many(commands: list[str]) -> str:
+    """Run several read-only git commands (e.g. ["status -s", "log --oneline -n 5"]) concurrently."""
+    if not repo_context.path:
+        return "[ERROR] Repo path not set. Call set_repo_path() first."
+    if not commands:
+        return "[ERROR] No commands given."
+    specs = []
+    for cmd in commands:
+        try:
+            args = shlex.split(cmd)
+        except ValueError as e:
+            return f"[ERROR] Could not parse '{cmd}': {e}"
+        if args[:1] == ["git"]:
+            args = args[1:]
+        if not _is_read_only(args):
+            return f"[ERROR] '{cmd}' is not a read-only git command; call it on its own."
+        specs.append(tuple(args))
+    outputs = await asyncio.gather(*(_run_git(args) for args in specs))
+    return "\n\n".join(f"$ git {shlex.join(args)}\n{out}" for args, out in zip(specs, outputs))
+
+_HAS_SH = shutil.which("sh") is not None
+
+async def run_git_chain(*commands: tuple[str, ...]) -> str:
+    # one `sh -c "git a && git b"` spawn instead of one process per command
+    if not repo_context.path:
+        return "[ERROR] Repo path not set. Call set_repo_path() first."
+    if not _HAS_SH:
+        # no POSIX shell (e.g. Windows): same && semantics, one spawn per command
+        outputs = []
+        async with _GIT_WRITE_LOCK:
+            for c in commands:
+                out = await _run_git(c)
+                if out.startswith("[ERROR]"):
+                    return out
+                outputs.append(out)
+        return outputs[-1]
+    script = " && ".join(shlex.join(["git", *_GIT_OPTS, *c]) for c in commands)
+    try:
+        logging.info(f"sh: {script} @ {repo_context.path}")
+        async with _GIT_WRITE_LOCK:
+            code, out, err = await _spawn("sh", "-c", script, env=repo_context.git_write_env)
+        if code != 0:
+            return f"[ERROR] {err or out}"
         return out or "[OK] Command succeeded."
-    except subprocess.CalledProcessError as e:
-        return f"[ERROR] {e.stderr.strip()}"
+    finally:
+        _invalidate_caches()
+
+SHELL_ALLOWED = frozenset({"ls", "cat", "pwd", "python", "python3", "pytest", "pip", "pip3",
+                           "npm", "node", "git", "docker"})
+_SHELL_OPERATOR_CHARS = frozenset("|&;<>()")
+
+def _split_pipeline(cmd: str) -> list[str] | str:
+    # only operators outside quotes count: `git log --grep '|'` is one command
+    stages, start, quote, i = [], 0, None, 0
+    while i < len(cmd):
+        c = cmd[i]
+        if c == "\\" and quote != "'":
+            i += 2
+            continue
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in _SHELL_OPERATOR_CHARS:
+            if c != "|" or cmd.startswith("|", i + 1):
+                return "[ERROR] Only `|` pipes are supported; redirects and command chaining are not. Run each command separately."
+            stages.append(cmd[start:i])
+            start = i + 1
+        i += 1
+    stages.append(cmd[start:])
+    return stages
+
+def _parse_shell_command(cmd: str) -> list[list[str]] | str:
+    # `a | b` is wired up here with plain pipes; anything else needs a real shell
+    parts = _split_pipeline(cmd)
+    if isinstance(parts, str):
+        return parts
+    try:
+        stages = [shlex.split(part) for part in parts]
+    except ValueError as e:
+        return f"[ERROR] Could not parse command: {e}"
+    for argv in stages:
+        if not argv:
+            return "[ERROR] Empty command." if len(stages) == 1 else "[ERROR] Empty command in pipeline."
+        if argv[0] not in SHELL_ALLOWED:
+            return f"[ERROR] '{argv[0]}' is not allowed. Allowed commands: {', '.join(sorted(SHELL_ALLOWED))}"
+    return stages
 
-def run_shell_command(cmd: str) -> str:
+async def _spawn_pipeline(stages: list[list[str]]) -> tuple[int, str, str]:
+    # each stage's stdout is an os.pipe() straight into the next one's stdin:
+    # one fork/exec per program and no /bin/sh in between
+    procs = []
+    async with _SPAWN_LIMIT:
+        stdin = None
+        try:
+            for i, argv in enumerate(stages):
+                last = i == len(stages) - 1
+                read_end, write_end = (None, None) if last else os.pipe()
+                try:
+                    procs.append(await asyncio.create_subprocess_exec(
+                        *argv,
+                        stdin=stdin,
+                        stdout=asyncio.subprocess.PIPE if last else write_end,
+                        stderr=asyncio.subprocess.PIPE,
+                        cwd=repo_context.path
+                    ))
+                except BaseException:
+                    if read_end is not None:
+                        os.close(read_end)
+                    raise
+                finally:
+                    # the children hold their own copies; each parent fd is closed exactly once
+                    if stdin is not None:
+                        os.close(stdin)
+                        stdin = None
+                    if write_end is not None:
+                        os.close(write_end)
+                stdin = read_end
+        except BaseException:
+            if stdin is not None:
+                os.close(stdin)
+            for proc in procs:
+                if proc.returncode is None:
+                    proc.kill()
+            raise
+        results = await asyncio.gather(*(proc.communicate() for proc in procs))
+    out = results[-1][0] or b""
+    err = b"\n".join(e.strip() for _, e in results if e and e.strip())
+    # sh semantics (last stage decides), except an early failure that left the
+    # pipeline with no output is reported instead of an empty success
+    code = procs[-1].returncode
+    if code == 0 and not out.strip():
+        code = next((p.returncode for p in procs if p.returncode not in (0, -signal.SIGPIPE)), 0)
+    return code, out.decode(errors="replace").strip(), err.decode(errors="replace").strip()
+
+async def run_shell_command(cmd: str) -> str:
     if not repo_context.path:
         return "[ERROR] Repo path not set."
+    stages = _parse_shell_command(cmd)
+    if isinstance(stages, str):
+        return stages
     try:
         logging.info(f"shell: {cmd} @ {repo_context.path}")
-        out = subprocess.run(
-            cmd, shell=True,
-            capture_output=True, text=True, check=True,
-            cwd=repo_context.path
-        ).stdout.strip()
+        # exec the program directly: no intermediate /bin/sh process
+        if len(stages) == 1:
+            code, out, err = await _spawn(*stages[0])
+        else:
+            code, out, err = await _spawn_pipeline(stages)
+        if code != 0:
+            return f"[ERROR] {err}"
         return out or "[OK] Command succeeded."
-    except subprocess.CalledProcessError as e:
-        return f"[ERROR] {e.stderr.strip()}"
+    except FileNotFoundError as e:
+        return f"[ERROR] {e.filename or stages[0][0]} is not installed."
+    finally:
+        _invalidate_caches()
+
+def _open_pygit2_repo(path: str):
+    if pygit2 is None:
+        return None
+    try:
+        return pygit2.Repository(path)
+    except pygit2.GitError as e:
+        logging.warning(f"pygit2 could not open {path}, using git CLI: {e}")
+        return None
 
-def set_repo_path(path: str) -> str:
-    if not os.path.exists(path):
+async def set_repo_path(path: str) -> str:
+    # a single directory read answers "exists?", "has .git?" and the preview
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except FileNotFoundError:
         return "[ERROR] Path does not exist."
+    except NotADirectoryError:
+        return "[ERROR] Path is not a directory."
     repo_context.path = path
-    if not os.path.isdir(os.path.join(path, ".git")):
-        subprocess.run(["git", "init"], cwd=path, check=True)
-    files = [f for f in os.listdir(path) if not f.startswith('.') and f not in {'.env', 'env', 'venv', '.venv'}]
-    preview = "\n".join(f"- {f}" for f in files[:10]) or "(empty)"
+    root = os.path.abspath(path)
+    repo_context.readme_path = os.path.join(root, 'README.md')
+    repo_context.context_path = os.path.join(root, _CONTEXT_FILE)
+    repo_context.legacy_context_path = os.path.join(root, _LEGACY_CONTEXT_FILE)
+    repo_context.dockerfile_path = os.path.join(root, 'Dockerfile')
+    repo_context.context_cache = None
+    repo_context.git_dir = None
+    # no GIT_DIR yet: git discovers the repo from cwd
+    repo_context.git_env = _GIT_BASE_ENV
+    repo_context.git_write_env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    _invalidate_caches()
+    dot_git = next((e for e in entries if e.name == ".git"), None)
+    if dot_git is None:
+        # init and the first status probe share one spawn; seed the cache with it
+        status = await run_git_chain(("init", "-q"), ("status", *_PORCELAIN_ARGS))
+        if status.startswith("[ERROR]"):
+            return status
+        _store_status("porcelain", _cache_gen, status)
+    if dot_git is None or dot_git.is_dir():
+        git_dir = os.path.join(root, ".git")
+    else:  # gitfile (worktree/submodule): let git resolve it once
+        git_dir = await run_git_command("rev-parse", "--absolute-git-dir")
+        if git_dir.startswith("[ERROR]"):
+            return git_dir
+    repo_context.git_dir = git_dir
+    repo_context.git_env = {**_GIT_BASE_ENV, "GIT_DIR": git_dir, "GIT_WORK_TREE": root}
+    repo_context.git_write_env.update(GIT_DIR=git_dir, GIT_WORK_TREE=root)
+    repo_context.repo = _open_pygit2_repo(path)
+    if repo_context.refresher is not None:
+        repo_context.refresher.cancel()
+    repo_context.refresher = asyncio.create_task(_status_refresher())
+    files = [e.name for e in entries if not e.name.startswith('.') and e.name not in _EXCLUDED_DIRS]
+    preview = _bullets(files[:10]) or "(empty)"
     return f"✅ Repo set to: {path}\n📁 Preview:\n{preview}"
 
-def get_status() -> str:
-    return run_git_command("status")
+def _head_name(repo) -> str:
+    if repo.head_is_detached:
+        return f"HEAD detached at {repo.head.peel(pygit2.Commit).short_id}"
+    return repo.references["HEAD"].target.removeprefix("refs/heads/")
+
+def _status_code(flags: int) -> str:
+    if flags & pygit2.GIT_STATUS_CONFLICTED:
+        return "UU"
+    if flags & pygit2.GIT_STATUS_WT_NEW:
+        return "??"
+    index = ("A" if flags & pygit2.GIT_STATUS_INDEX_NEW else
+             "M" if flags & pygit2.GIT_STATUS_INDEX_MODIFIED else
+             "D" if flags & pygit2.GIT_STATUS_INDEX_DELETED else
+             "R" if flags & pygit2.GIT_STATUS_INDEX_RENAMED else
+             "T" if flags & pygit2.GIT_STATUS_INDEX_TYPECHANGE else " ")
+    worktree = ("M" if flags & pygit2.GIT_STATUS_WT_MODIFIED else
+                "D" if flags & pygit2.GIT_STATUS_WT_DELETED else
+                "R" if flags & pygit2.GIT_STATUS_WT_RENAMED else
+                "T" if flags & pygit2.GIT_STATUS_WT_TYPECHANGE else " ")
+    return index + worktree
+
+def _pygit2_status(repo) -> str:
+    lines = [f"On branch {_head_name(repo)}"]
+    if not repo.head_is_unborn and not repo.head_is_detached:
+        branch = repo.branches.local.get(repo.head.shorthand)
+        upstream = branch.upstream if branch else None
+        if upstream:
+            ahead, behind = repo.ahead_behind(branch.target, upstream.target)
+            if ahead:
+                lines.append(f"Your branch is ahead of '{upstream.shorthand}' by {ahead} commit(s).")
+            if behind:
+                lines.append(f"Your branch is behind '{upstream.shorthand}' by {behind} commit(s).")
+    # "normal" collapses an untracked directory to one `dir/` entry, as git status does
+    changes = [f"{_status_code(flags)} {p}" for p, flags in sorted(repo.status(untracked_files="normal").items())
+               if not flags & pygit2.GIT_STATUS_IGNORED]
+    lines.extend(changes or ["nothing to commit, working tree clean"])
+    return "\n".join(lines)
+
+async def _read_status() -> str:
+    if repo_context.repo is not None:
+        try:
+            return await _in_repo_thread(_pygit2_status, repo_context.repo)
+        except pygit2.GitError as e:
+            return f"[ERROR] {e}"
+    return await run_git_command("status")
+
+# machine format: no pretty-printing, no rename detection; NUL-terminated records
+# keep odd paths (newlines, "? " prefixes) from being mistaken for entries
+_PORCELAIN_ARGS = ("--porcelain=v2", "--branch", "-z", "--no-renames")
+
+async def _read_porcelain() -> str:
+    return await run_git_command("status", *_PORCELAIN_ARGS)
+
+async def get_status() -> str:
+    return await _cached_status("status", _read_status)
 
-def add_data() -> str:
-    return run_git_command("add", ".")
+async def add_data() -> str:
+    return await run_git_command("add", ".")
 
-def commit_data(msg: str) -> str:
-    add_res = run_git_command("add", ".")
-    commit_res = run_git_command("commit", "-m", msg)
-    return f"{add_res}\n{commit_res}"
+async def commit_data(msg: str, include_untracked: bool = True) -> str:
+    # either way a single spawn: `commit -a` stages tracked edits itself,
+    # new files need the add chained in front of the commit
+    if not include_untracked:
+        return await run_git_command("commit", "-a", "-m", msg)
+    return await run_git_chain(("add", "."), ("commit", "-m", msg))
 
-def push_changes() -> str:
-    update_readme()
-    return run_git_command("push")
+async def push_changes() -> str:
+    await update_readme()
+    return await run_git_command("push")
 
-def pull_changes() -> str:
-    return run_git_command("pull")
+async def pull_changes() -> str:
+    return await run_git_command("pull")
 
-def rollback_last_commit() -> str:
-    return run_git_command("reset", "--soft", "HEAD~1")
+async def rollback_last_commit() -> str:
+    return await run_git_command("reset", "--soft", "HEAD~1")
+
+def _head_is_unborn(repo) -> bool:
+    return repo.head_is_unborn
+
+async def create_branch(branch_name: str) -> str:
+    repo = repo_context.repo
+    if repo is None or await _in_repo_thread(_head_is_unborn, repo):
+        return await run_git_command("checkout", "-b", branch_name)
+    def create():
+        repo.checkout(repo.branches.local.create(branch_name, repo.head.peel(pygit2.Commit)))
+    async with _GIT_WRITE_LOCK:
+        try:
+            await _in_repo_thread(create)
+            return f"Switched to a new branch '{branch_name}'"
+        except (pygit2.GitError, ValueError) as e:
+            return f"[ERROR] {e}"
+        finally:
+            _invalidate_caches()
+
+async def switch_branch(branch_name: str) -> str:
+    repo = repo_context.repo
+    branch = await _in_repo_thread(repo.branches.local.get, branch_name) if repo is not None else None
+    if branch is None:
+        # remote-tracking DWIM and detached checkouts stay with the CLI
+        return await run_git_command("checkout", branch_name)
+    async with _GIT_WRITE_LOCK:
+        try:
+            await _in_repo_thread(repo.checkout, branch)
+            return f"Switched to branch '{branch_name}'"
+        except pygit2.GitError as e:
+            return f"[ERROR] {e}"
+        finally:
+            _invalidate_caches()
+
+async def delete_branch(branch_name: str) -> str:
+    return await run_git_command("branch", "-d", branch_name)
+
+async def stash_changes() -> str:
+    return await run_git_command("stash")
+
+async def apply_stash() -> str:
+    return await run_git_command("stash", "apply")
+
+async def view_log(n: int = 5) -> str:
+    repo = repo_context.repo
+    if repo is None or await _in_repo_thread(_head_is_unborn, repo):
+        # one spawn for any n; NUL-separated records survive odd subjects
+        out = await run_git_command("log", "-z", "--pretty=format:%h %s", "-n", str(n), memo=True)
+        return out if out.startswith("[") else "\n".join(out.split("\x00"))
+    def walk():
+        lines = []
+        for commit in islice(repo.walk(repo.head.target, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME), n):
+            subject = commit.message.partition("\n")[0]
+            lines.append(f"{commit.short_id} {subject}")
+        return "\n".join(lines)
+    try:
+        return await _in_repo_thread(walk)
+    except pygit2.GitError as e:
+        return f"[ERROR] {e}"
+
+# one compiled pass over porcelain v2 -z: ahead count, tracked XY codes, untracked marks;
+# every match is anchored at the start of a NUL-separated record
+_PORCELAIN_RE = re.compile(
+    r"(?:\A|(?<=\0))(?:# branch\.ab \+(?P<ahead>\d+)|[12u] (?P<x>.)(?P<y>.)|(?P<untracked>\?) "
+    r"|# branch\.oid (?P<initial>\(initial\)))"
+)
+
+def _settle_flags(flags: set[str]) -> set[str]:
+    if not flags & {"staged", "unstaged", "untracked"}:
+        flags.discard("initial")  # nothing to put in a first commit yet
+        flags.add("clean")
+    return flags
+
+def _parse_porcelain(status: str) -> set[str]:
+    flags = set()
+    for m in _PORCELAIN_RE.finditer(status):
+        if m["x"] is not None:
+            if m["x"] != ".":
+                flags.add("staged")
+            if m["y"] != ".":
+                flags.add("unstaged")
+        elif m["untracked"] is not None:
+            flags.add("untracked")
+        elif m["initial"] is not None:
+            flags.add("initial")
+        elif m["ahead"] != "0":
+            flags.add("ahead")
+    return _settle_flags(flags)
+
+# fallback for gits without porcelain v2: one alternation pass over the human
+# output (English is guaranteed by LC_ALL=C.UTF-8 in _GIT_BASE_ENV)
+_HUMAN_STATUS_RE = re.compile(
+    r"(Changes not staged|Changes to be committed|Untracked files|Your branch is ahead of|No commits yet)"
+)
+_HUMAN_STATUS_FLAGS = {
+    "Changes not staged": "unstaged",
+    "Changes to be committed": "staged",
+    "Untracked files": "untracked",
+    "Your branch is ahead of": "ahead",
+    "No commits yet": "initial",
+}
+
+def _parse_human_status(status: str) -> set[str]:
+    return _settle_flags({_HUMAN_STATUS_FLAGS[hit] for hit in _HUMAN_STATUS_RE.findall(status)})
+
+_RECS = (
+    ("initial", "- No commits yet: commit_data(msg) creates the first one"),
+    ("unstaged", "- Stage changes: add_data()"),
+    ("staged", "- Commit staged: commit_data(msg)"),
+    ("untracked", "- Stage untracked: add_data()"),
+    ("ahead", "- Push to remote: push_changes()"),
+    ("clean", "- Tree clean: maybe switch_branch() or pull_changes()."),
+)
 
-def create_branch(branch_name: str) -> str:
-    return run_git_command("checkout", "-b", branch_name)
+async def recommend_action() -> str:
+    # independent reads: the status probe and the last commit run side by side
+    status, last = await asyncio.gather(
+        _cached_status("porcelain", _read_porcelain),
+        run_git_command("log", "-1", "--format=%h %s", memo=True),
+    )
+    if not status.startswith("[ERROR]"):
+        flags = _parse_porcelain(status)
+    else:
+        # the CLI, not get_status: pygit2's rendering doesn't carry git's phrases
+        status = await run_git_command("status")
+        if status.startswith("[ERROR]"):
+            return status
+        flags = _parse_human_status(status)
+    recs = "\n".join(msg for flag, msg in _RECS if flag in flags)
+    if not recs:
+        return "Nothing to recommend."
+    header = "" if last.startswith("[ERROR]") else f"Last commit: {last}\n"
+    return f"{header}Here’s my recommendation:\n{recs}\n"
 
-def switch_branch(branch_name: str) -> str:
-    return run_git_command("checkout", branch_name)
+async def snapshot() -> dict:
+    """Status, recent log and top-level files in one call; all three reads run concurrently."""
+    status, log, files = await asyncio.gather(get_status(), view_log(), list_repo_files())
+    return {"status": status, "log": log, "files": files}
 
-def delete_branch(branch_name: str) -> str:
-    return run_git_command("branch", "-d", branch_name)
+# ——— Repo file stream ———
+_LIST_LIMIT = 500
 
-def stash_changes() -> str:
-    return run_git_command("stash")
+def iter_repo_files(prefix: str = ""):
+    """Yield repo paths present on disk (tracked and untracked, .gitignore applied) as git streams them."""
+    scope = ["--", prefix] if prefix else []
+    # --cached reads the index, which still holds tracked files already deleted
+    # from the worktree; git lists those separately (usually a handful), and
+    # --deduplicate folds the per-stage entries of unmerged paths into one
+    deleted = set(_iter_ls_files(["--deleted", *scope]))
+    for path in _iter_ls_files(["--cached", "--others", "--exclude-standard", "--deduplicate", *scope]):
+        if path not in deleted:
+            yield path
 
-def apply_stash() -> str:
-    return run_git_command("stash", "apply")
+def _iter_ls_files(args):
+    argv = ["git", *_GIT_OPTS, "ls-files", "-z", *args]
+    with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          cwd=repo_context.path, env=repo_context.git_env) as proc:
+        try:
+            pending = b""
+            while chunk := proc.stdout.read1(1 << 16):
+                *paths, pending = (pending + chunk).split(b"\0")
+                for path in paths:
+                    yield path.decode(errors="replace")
+            if proc.wait() != 0:
+                raise RuntimeError(proc.stderr.read().decode(errors="replace").strip())
+        finally:
+            # a consumer that stops early (islice) shouldn't leave git running
+            if proc.poll() is None:
+                proc.kill()
 
-def view_log() -> str:
-    return run_git_command("log", "--oneline", "-n", "5")
+def _iter_children(prefix: str, skip):
+    # immediate children of `prefix`, derived from the recursive path stream
+    seen = set()
+    for path in iter_repo_files(prefix):
+        name = path[len(prefix):].partition("/")[0]
+        if name and name[0] != '.' and name not in skip and name not in seen:
+            seen.add(name)
+            yield name
 
-def recommend_action() -> str:
-    status = run_git_command("status")
-    recs = ["Here’s my recommendation:\n"]
-    if "Changes not staged" in status: recs.append("- Stage changes: add_data()\n")
-    if "Changes to be committed" in status: recs.append("- Commit staged: commit_data(msg)\n")
-    if "Untracked files" in status: recs.append("- Stage untracked: add_data()\n")
-    if "ahead of" in status: recs.append("- Push to remote: push_changes()\n")
-    if "working tree clean" in status: recs.append("- Tree clean: maybe switch_branch() or pull_changes().\n")
-    return "".join(recs) if len(recs) > 1 else "Nothing to recommend."
+def _scandir_names(path: str, skip) -> list[str]:
+    # scandir avoids a stat per entry
+    with os.scandir(path) as it:
+        return [e.name for e in it if e.name[0] != '.' and e.name not in skip][:_LIST_LIMIT]
 
-def list_repo_files() -> str:
+def _list_repo_files_sync() -> str:
     if not repo_context.path:
         return "[ERROR] Repo path not set."
-    items = [f for f in os.listdir(repo_context.path)
-             if not f.startswith('.') and f not in {'.env', 'env', 'venv', '.venv', 'README.md','__pycache__'}]
-    return "📁 Files:\n" + "\n".join(f"- {i}" for i in items)
+    # one readdir of the root; its mtime changes whenever an entry is added,
+    # removed or renamed, which is exactly what the cached listing depends on
+    mtime = os.stat(repo_context.path).st_mtime_ns
+    if _files_cache["mtime"] != mtime:
+        items = _scandir_names(repo_context.path, _ROOT_EXCLUDED)
+        _files_cache["val"] = _FILES_HEADER + _bullets(items)
+        _files_cache["mtime"] = mtime
+    return _files_cache["val"]
 
-def list_folder_contents(subpath: str) -> str:
+async def list_repo_files() -> str:
+    return await _in_fs_pool(_list_repo_files_sync)
+
+def _list_folder_contents_sync(subpath: str) -> str:
     if not repo_context.path:
         return "[ERROR] Repo path not set."
     full = os.path.join(repo_context.path, subpath)
     if not os.path.isdir(full):
         return f"[ERROR] {subpath} is not a directory."
-    items = [i for i in os.listdir(full) if not i.startswith('.') and i not in {'.env', 'env', 'venv', '.venv','__pycache__'}]
-    return f"📂 Contents of {subpath}:\n" + "\n".join(f"- {i}" for i in items)
+    # git reports repo-relative paths, so match on the normalized relative prefix
+    rel = os.path.relpath(os.path.normpath(full), repo_context.path).replace(os.sep, "/")
+    if rel == ".." or rel.startswith("../"):
+        return f"[ERROR] {subpath} is outside the repository."
+    prefix = "" if rel == "." else rel + "/"
+    try:
+        items = list(islice(_iter_children(prefix, _EXCLUDED_DIRS), _LIST_LIMIT))
+    except (RuntimeError, OSError):
+        items = _scandir_names(full, _EXCLUDED_DIRS)
+    return f"📂 Contents of {subpath}:\n" + _bullets(items)
+
+async def list_folder_contents(subpath: str) -> str:
+    return await _in_fs_pool(_list_folder_contents_sync, subpath)
+
+_STRUCTURE_SKIP_DIRS = _EXCLUDED_DIRS | {'.git', 'node_modules'}
+
+def _is_listed(path: str) -> bool:
+    *dirs, name = path.split("/")
+    if name[0] == '.' or name in _EXCLUDED_FILES:
+        return False
+    return not any(d[0] == '.' or d in _STRUCTURE_SKIP_DIRS for d in dirs)
+
+def _list_all_files_sync(limit: int) -> str:
+    if not repo_context.path:
+        return "[ERROR] Repo path not set."
+    try:
+        files = list(islice(filter(_is_listed, iter_repo_files()), limit))
+    except (RuntimeError, OSError) as e:
+        return f"[ERROR] Could not list files: {e}"
+    return _ALL_FILES_HEADER + _bullets(files)
 
-def describe_structure() -> str:
+async def list_all_files(limit: int = _LIST_LIMIT) -> str:
+    """Every file path in the repo (recursively, .gitignore applied), up to `limit`."""
+    return await _in_fs_pool(_list_all_files_sync, limit)
+
+def _describe_structure_sync() -> str:
     if not repo_context.path:
         return "[ERROR] Repo path not set."
     lines = []
-    for root, dirs, files in os.walk(repo_context.path):
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in {'.env', 'env', 'venv', '.venv','__pycache__'}]
-        level = root.replace(repo_context.path, '').count(os.sep)
+    # iterative DFS over scandir entries: file/dir type comes from readdir, no extra stat
+    stack = [(repo_context.path, os.path.basename(os.path.normpath(repo_context.path)), 0)]
+    while stack:
+        root, folder, level = stack.pop()
         indent = '  ' * level
-        folder = os.path.basename(root) or os.path.basename(repo_context.path)
         lines.append(f"{indent}- {folder}/")
-        for f in files:
-            if f.startswith('.') or f in {'README.md', '.env'}:
-                continue
-            lines.append(f"{indent}  - {f}")
+        subdirs = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    name = entry.name
+                    if name[0] == '.':
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in _STRUCTURE_SKIP_DIRS:
+                            subdirs.append((entry.path, name, level + 1))
+                    elif name not in _EXCLUDED_FILES:
+                        lines.append(f"{indent}  - {name}")
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
     return "\n".join(lines)
 
-def update_readme() -> str:
+def _render_tree(root_name: str, paths) -> str:
+    # nest the path stream into dicts (file -> None), then render with the same
+    # "header, files, subdirectories" layout as the filesystem walk
+    tree: dict = {}
+    for path in filter(_is_listed, paths):
+        *dirs, name = path.split("/")
+        node = tree
+        for d in dirs:
+            node = node.setdefault(d, {})
+        node[name] = None
+    lines = []
+    stack = [(root_name, tree, 0)]
+    while stack:
+        folder, node, level = stack.pop()
+        indent = '  ' * level
+        lines.append(f"{indent}- {folder}/\n")
+        subdirs = []
+        for name in sorted(node):
+            child = node[name]
+            if child is None:
+                lines.append(f"{indent}  - {name}\n")
+            else:
+                subdirs.append((name, child, level + 1))
+        stack.extend(reversed(subdirs))
+    return "".join(lines).rstrip("\n")
+
+def _structure_stamp(watched) -> tuple | None:
+    # HEAD + index cover tracked files; directory mtimes (as in git's untracked
+    # cache) and .gitignore/exclude mtimes cover untracked and ignore changes
+    state = _repo_state()
+    if state is None:
+        return None
+    try:
+        return state, tuple(os.stat(p).st_mtime_ns for p in watched)
+    except OSError:
+        return None
+
+# every directory git visits for ignored files, plus pattern-ignored dirs as one entry
+_IGNORED_ARGS = ("--others", "--ignored", "--exclude-standard", "--directory")
+
+def _watch_dirs(paths, watched: set):
+    root = repo_context.path
+    for path in paths:
+        d, _, name = path.rpartition("/")
+        if name == ".gitignore":
+            watched.add(os.path.join(root, path))
+        while d:
+            full = os.path.join(root, d)
+            if full in watched:
+                break
+            watched.add(full)
+            d = d.rpartition("/")[0]
+        yield path
+
+def _describe_structure_from_git() -> str:
+    cached = repo_context.structure_cache
+    if cached is not None and cached[1] == _structure_stamp(cached[0]):
+        return cached[2]
+    # git applies .gitignore in C; the tree is built while paths are still streaming in
+    root_name = os.path.basename(os.path.normpath(repo_context.path))
+    gen = _cache_gen
+    watched = {repo_context.path, os.path.join(repo_context.git_dir or "", "info", "exclude")}
+    try:
+        text = _render_tree(root_name, _watch_dirs(iter_repo_files(), watched))
+        # ignored entries too: a directory holding only ignored files never shows
+        # up in the listing, but gaining a tracked file has to change the stamp
+        for _ in _watch_dirs(_iter_ls_files(_IGNORED_ARGS), watched):
+            pass
+    except (RuntimeError, OSError):
+        return _describe_structure_sync()
+    watched = tuple(p for p in watched if os.path.exists(p))
+    stamp = _structure_stamp(watched)
+    if stamp is not None and gen == _cache_gen:
+        repo_context.structure_cache = (watched, stamp, text)
+    return text
+
+async def describe_structure() -> str:
     if not repo_context.path:
         return "[ERROR] Repo path not set."
-    readme_path = os.path.join(repo_context.path, 'README.md')
-    content = '\n\n# Project Structure\n\n' + describe_structure() + '\n'
+    return await _in_fs_pool(_describe_structure_from_git)
+
+_README_HEADING = b"# Project Structure\n"
+# the generated section runs from its heading to the next top-level heading (or EOF)
+_README_SECTION_RE = re.compile(rb"^# Project Structure\r?$", re.MULTILINE)
+_README_NEXT_HEADING_RE = re.compile(rb"^# ", re.MULTILINE)
+
+async def update_readme() -> str:
+    if not repo_context.path:
+        return "[ERROR] Repo path not set."
+    structure = await describe_structure()
+    readme_path = repo_context.readme_path
+    tmp_path = os.path.join(repo_context.path, '.README.md.tmp')
     try:
-        with open(readme_path, 'a', encoding='utf-8') as f:
-            f.write(content)
-        return '✅ Appended project structure to README.md.'
+        try:
+            with open(readme_path, 'rb') as f:
+                existing = f.read()
+        except FileNotFoundError:
+            existing = b''
+        # replace only the generated section; whatever follows it is kept
+        section = None
+        for section in _README_SECTION_RE.finditer(existing):
+            pass
+        if section is not None:
+            head = existing[:section.start()]
+            nxt = _README_NEXT_HEADING_RE.search(existing, section.end())
+            tail = existing[nxt.start():] if nxt else b''
+        else:
+            head, tail = existing, b''
+        nl = b"\r\n" if b"\r\n" in existing else b"\n"
+        head = head.rstrip(b"\r\n")
+        body = (_README_HEADING + b"\n" + structure.encode('utf-8') + b"\n").replace(b"\n", nl)
+        updated = (head + nl + nl if head else b"") + body + (nl + tail if tail else b"")
+        # the file on disk is the only authority: a checkout, pull or manual edit
+        # can change it behind our back, and one read is cheap next to a rewrite
+        if updated == existing:
+            return '✅ README.md already current.'
+        # write-then-rename so a crash never leaves a half-written README
+        with open(tmp_path, 'wb') as f:
+            f.write(updated)
+        os.replace(tmp_path, readme_path)
+        _invalidate_caches()
+        return '✅ Updated project structure in README.md.'
     except Exception as e:
         return f"[ERROR] Failed to update README.md: {e}"
 
     
 # ——— Tool: Get file content ————————————————————————————————
+_MMAP_MIN_BYTES = 1 << 20
+_FILE_CACHE_ENTRY_MAX = 256 << 10
+_FILE_CACHE_BUDGET = 32 << 20  # total bytes held, however many files a summarize run reads
+
+def _read_text(file_path: str) -> str:
+    # one read of the whole file and a single decode, instead of text-mode's
+    # incremental decoder; large files are mapped rather than copied into a buffer
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        if size >= _MMAP_MIN_BYTES:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, "utf-8")
+        else:
+            chunks = []
+            while chunk := os.read(fd, max(size, 1 << 16)):
+                chunks.append(chunk)
+            text = b"".join(chunks).decode("utf-8")
+    finally:
+        os.close(fd)
+    if "\r" in text:  # keep text mode's universal-newline output
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+# path -> (mtime, size, text), LRU-ordered: the summarizer often re-reads a file
+# before emitting its JSON, and any write changes (mtime, size) so stale text is
+# never served. get_file_content runs on pool threads, hence the lock.
+_file_cache: "OrderedDict[str, tuple[int, int, str]]" = OrderedDict()
+_file_cache_bytes = 0
+_FILE_CACHE_LOCK = threading.Lock()
+
+def _read_text_cached(file_path: str, mtime_ns: int, size: int) -> str:
+    global _file_cache_bytes
+    with _FILE_CACHE_LOCK:
+        hit = _file_cache.get(file_path)
+        if hit is not None and hit[:2] == (mtime_ns, size):
+            _file_cache.move_to_end(file_path)
+            return hit[2]
+    text = _read_text(file_path)
+    with _FILE_CACHE_LOCK:
+        old = _file_cache.pop(file_path, None)
+        if old is not None:
+            _file_cache_bytes -= old[1]
+        _file_cache[file_path] = (mtime_ns, size, text)
+        _file_cache_bytes += size
+        while _file_cache_bytes > _FILE_CACHE_BUDGET:
+            _file_cache_bytes -= _file_cache.popitem(last=False)[1][1]
+    return text
+
 def get_file_content(file_name: str) -> str:
     try:
-        file_path = os.path.join(repo_context.path, file_name)
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        file_path = os.path.abspath(os.path.join(repo_context.path, file_name))
+        st = os.stat(file_path)
+        if st.st_size > _FILE_CACHE_ENTRY_MAX:
+            return _read_text(file_path)
+        return _read_text_cached(file_path, st.st_mtime_ns, st.st_size)
     except Exception as e:
         return f"[ERROR] Could not read {file_name}: {e}"
 
 
-# ——— Tool: Generate context.json ————————————————————————
-def update_code_context(content: dict) -> str:
-    context_path = os.path.join(repo_context.path, 'context.json')
+# ——— Tool: Generate context.jsonl ———————————————————————
+# one JSON record per line: appending is O(1) instead of re-reading and
+# rewriting the whole list on every summarized file
+_CONTEXT_FILE = 'context.jsonl'
+_LEGACY_CONTEXT_FILE = 'context.json'
+
+def _dump_line(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode('utf-8')
+
+_loads = orjson.loads if orjson else json.loads
+
+def _append_lines(path: str, data: bytes) -> None:
+    # O_APPEND + a single os.write per batch: no buffered text layer, and
+    # each record lands whole at the end of the file
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
     try:
-        # Check if file exists and has valid JSON list
-        if os.path.exists(context_path):
-            with open(context_path, 'r', encoding='utf-8') as f:
-                try:
-                    existing_data = json.load(f)
-                    if not isinstance(existing_data, list):
-                        existing_data = [existing_data]
-                except json.JSONDecodeError:
-                    existing_data = []
-        else:
-            existing_data = []
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
-        # Append new content
-        existing_data.append(content)
+def _load_context() -> list:
+    if repo_context.context_cache is not None:
+        return repo_context.context_cache
+    records = []
+    context_path = repo_context.context_path
+    legacy_path = repo_context.legacy_context_path
+    if os.path.exists(context_path):
+        with open(context_path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        records.append(_loads(line))
+                    except ValueError:
+                        logging.warning(f"Skipping malformed line in {_CONTEXT_FILE}")
+    elif os.path.exists(legacy_path):
+        # migrate the old indent=2 list once; later calls only append
+        with open(legacy_path, 'rb') as f:
+            try:
+                legacy = _loads(f.read())
+            except ValueError:
+                legacy = []
+        records = legacy if isinstance(legacy, list) else [legacy]
+        if records:
+            _append_lines(context_path, b"".join(map(_dump_line, records)))
+    repo_context.context_cache = records
+    return records
 
-        # Write updated list back to file
-        with open(context_path, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, indent=2)
+def update_code_context(content: dict) -> str:
+    try:
+        records = _load_context()
+        _append_lines(repo_context.context_path, _dump_line(content))
+        records.append(content)
+        _invalidate_caches()
 
-        return f"✅ Appended new context to context.json successfully."
+        return f"✅ Appended new context to {_CONTEXT_FILE} successfully."
+    except Exception as e:
+        return f"[ERROR] Failed to update {_CONTEXT_FILE}: {e}"
+
+def read_code_context() -> str:
+    if not repo_context.path:
+        return "[ERROR] Repo path not set."
+    try:
+        records = _load_context()
     except Exception as e:
-        return f"[ERROR] Failed to update context.json: {e}"
+        return f"[ERROR] Failed to read {_CONTEXT_FILE}: {e}"
+    if not records:
+        return f"[ERROR] {_CONTEXT_FILE} is empty; summarize the files first."
+    if orjson:
+        return orjson.dumps(records, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(records, indent=2, ensure_ascii=False)
+
+# ——— Tool: Summarize all files ——————————————————————————
+_SUMMARY_MODEL = "gemini-2.0-flash"
+_SUMMARY_CONCURRENCY = 8
+_SUMMARY_PROMPT = (
+    "Summarize this source file. Return only a JSON object with:\n"
+    "- file: the filename\n"
+    "- summary: a 2–3 sentence description of its purpose and logic\n"
+    "- imports: list of imports used\n"
+    "- requirements: list of external packages needed for Docker or installation\n"
+    "\nFile: {path}\n\n{content}"
+)
+
+@functools.lru_cache(maxsize=1)
+def _genai_client():
+    from google import genai  # same credentials/env (GOOGLE_API_KEY, Vertex) as the agents
+    return genai.Client()
+
+async def _summarize_file(path: str) -> dict:
+    from google.genai import types
+    content = await _in_fs_pool(get_file_content, path)
+    if content.startswith("[ERROR]"):
+        raise ValueError(content)
+    resp = await _genai_client().aio.models.generate_content(
+        model=_SUMMARY_MODEL,
+        contents=_SUMMARY_PROMPT.format(path=path, content=content),
+        config=types.GenerateContentConfig(response_mime_type="application/json"),
+    )
+    record = _loads(resp.text)
+    if not isinstance(record, dict):
+        raise ValueError("model did not return a JSON object")
+    record["file"] = path
+    return record
+
+async def summarize_all_files(limit: int = _LIST_LIMIT) -> str:
+    """Summarize every repo file (up to `limit`) concurrently and append the records to context.jsonl."""
+    if not repo_context.path:
+        return "[ERROR] Repo path not set."
+    try:
+        files = await _in_fs_pool(lambda: [
+            p for p in islice(filter(_is_listed, iter_repo_files()), limit)
+            if p not in (_CONTEXT_FILE, _LEGACY_CONTEXT_FILE)
+        ])
+    except (RuntimeError, OSError) as e:
+        return f"[ERROR] Could not list files: {e}"
+    sem = asyncio.Semaphore(_SUMMARY_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+    failed = []
+
+    async def process(path: str) -> None:
+        async with sem:
+            try:
+                await queue.put(await _summarize_file(path))
+            except Exception as e:
+                logging.warning(f"summarize {path}: {e}")
+                failed.append(path)
+
+    async def writer() -> int:
+        # single consumer: records land in completion order without write contention
+        written = 0
+        while (record := await queue.get()) is not None:
+            out = update_code_context(record)
+            if out.startswith("[ERROR]"):
+                failed.append(record["file"])
+            else:
+                written += 1
+        return written
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(*(process(p) for p in files))
+    finally:
+        await queue.put(None)
+        written = await writer_task
+    result = f"✅ Summarized {written} of {len(files)} files into {_CONTEXT_FILE}."
+    if failed:
+        result += "\nSkipped:\n" + _bullets(sorted(failed))
+    return result
 
     
-# Reads context.json and sends it to the LLM agent for Dockerfile generation
+# Reads context.jsonl and sends it to the LLM agent for Dockerfile generation
 def generate_dockerfile_from_context(dockerfile_content: str) -> str:
     try:
         # Check if repo_context.path is set
         if repo_context.path is None:
             return "[ERROR] Repository path is not set in RepoContext."
 
-        # Define path for Dockerfile inside the repo context
-        dockerfile_path = os.path.join(repo_context.path, "Dockerfile")
+        dockerfile_path = repo_context.dockerfile_path
 
         # Create the Dockerfile
         with open(dockerfile_path, "w", encoding="utf-8") as f:
             f.write(dockerfile_content.strip())
+        _invalidate_caches()
         
         return f"✅ Dockerfile successfully created at: {dockerfile_path}"
 
     except Exception as e:
         return f"[ERROR] Failed to write Dockerfile: {str(e)}"
 
-def build_docker_image(tag: str = "my_app_image") -> str:
+# Docker output is streamed line by line into a bounded tail instead of buffering whole logs
+_DOCKER_TAIL = 200
+_STREAM_LINE_MAX = 1 << 20  # longer lines are replaced by a marker, not buffered
+_CONTAINER_CRASH = re.compile(r"Traceback|Exception")
+
+async def _stream_process(*argv: str, watch=None, cwd: str | None = None) -> tuple[int, str, bool]:
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        cwd=cwd
+    )
+    tail = deque(maxlen=_DOCKER_TAIL)
+    matched = False
+
+    def emit(raw: bytes) -> None:
+        nonlocal matched
+        if len(raw) > _STREAM_LINE_MAX:
+            tail.append("[... overlong line dropped ...]")
+            return
+        line = raw.decode(errors="replace").rstrip()
+        logging.info(f"{argv[0]} {argv[1]}: {line}")
+        tail.append(line)
+        if watch is not None and watch.search(line):
+            matched = True
+
+    # split chunks ourselves: readline() can't tell us whether an overlong line
+    # was dropped whole or only up to the limit, so it either loses the next line
+    # or leaks the rest of the long one into the tail
+    pending = b""
+    dropping = False  # inside an overlong line; skip up to its newline
+    try:
+        while chunk := await proc.stdout.read(1 << 16):
+            *lines, pending = (pending + chunk).split(b"\n")
+            for raw in lines:
+                if dropping:
+                    dropping = False
+                else:
+                    emit(raw)
+            if len(pending) > _STREAM_LINE_MAX:
+                if not dropping:
+                    tail.append("[... overlong line dropped ...]")
+                pending, dropping = b"", True
+        if pending and not dropping:
+            emit(pending)
+        await proc.wait()
+    finally:
+        # an error or cancellation mid-stream must not leave the child running
+        if proc.returncode is None:
+            proc.kill()
+    return proc.returncode, "\n".join(tail), matched
+
+async def build_docker_image(tag: str = "my_app_image") -> str:
     try:
-        result = subprocess.run(
-            ["docker", "build", "-t", tag, "."],
-            capture_output=True, text=True,
-            cwd=repo_context.path
+        # the exit code is the verdict: BuildKit also prints non-fatal `#N ERROR`
+        # lines (e.g. a failed cache import) in builds that succeed
+        code, tail, _ = await _stream_process(
+            "docker", "build", "--progress=plain", "-t", tag, ".", cwd=repo_context.path
         )
-        if result.returncode == 0:
+        if code == 0:
             return f"✅ Docker image built successfully with tag: {tag}"
         else:
-            return f"[ERROR] Docker build failed:\n{result.stdout}\n{result.stderr}"
+            return f"[ERROR] Docker build failed:\n{tail}"
     except Exception as e:
         return f"[ERROR] Exception during Docker build: {e}"
 
 
-def get_available_port(start_port: int = 8000, end_port: int = 8100) -> int:
+def get_available_port(start_port: int | None = None, end_port: int | None = None) -> int:
     """
-    Return the first free TCP port in [start_port, end_port).
-    Cross-platform method by attempting to bind each port.
+    Return a free TCP port. Without a range the kernel picks one atomically
+    (bind to port 0); with a range, the kernel's pick is used if it falls in
+    [start_port, end_port), otherwise the range is probed port by port.
     """
-    for port in range(start_port, end_port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("0.0.0.0", 0))
+        port = s.getsockname()[1]
+    if start_port is None or start_port <= port < (end_port or 65536):
+        return port
+    for port in range(start_port, end_port or 65536):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             try:
@@ -239,101 +1219,95 @@ def get_available_port(start_port: int = 8000, end_port: int = 8100) -> int:
                 continue
     raise RuntimeError(f"No free ports found in range {start_port}-{end_port}")
 
-def run_docker_container(tag: str) -> str:
+async def run_docker_container(tag: str) -> str:
     try:
         # Run container without manual port mapping
-        result = subprocess.run(
-            ["docker", "run", "-d", tag],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            return f"[ERROR] Docker run failed:\n{result.stdout}\n{result.stderr}"
+        code, out, _ = await _stream_process("docker", "run", "-d", tag)
+        if code != 0:
+            return f"[ERROR] Docker run failed:\n{out}"
 
-        container_id = result.stdout.strip()
+        # pull progress may precede it; the container ID is the last line
+        container_id = out.rsplit("\n", 1)[-1].strip()
 
         # Check container logs for crash
-        logs = subprocess.run(["docker", "logs", container_id], capture_output=True, text=True)
-        if "Traceback" in logs.stdout or "Exception" in logs.stdout:
-            return f"[ERROR] Container log shows crash:\n{logs.stdout}"
+        _, logs, crashed = await _stream_process("docker", "logs", container_id, watch=_CONTAINER_CRASH)
+        if crashed:
+            return f"[ERROR] Container log shows crash:\n{logs}"
         return f"🚀 Docker container running!\nContainer ID: {container_id}"
 
     except Exception as e:
         return f"[ERROR] Exception during Docker run: {e}"
 # ——— Agent: Summarizer —————————————————————————————————————
-summarizer = LlmAgent(
-    name="Summarizer",
-    model="gemini-2.0-flash",
-    instruction=(
-        ""
-        "You are a code summarization assistant.\n"
-        "Given the full contents of a source file, return a JSON object with:\n"
-        "- file: the filename\n"
-        "- summary: a 2–3 sentence description of its purpose and logic\n"
-        "- imports: list of imports used\n"
-        "- requirements: list of external packages needed for Docker or installation\n"
-        "Do not ask user for validation of json directly call update_code_context"
-        "Only respond with a JSON object to update_code_context.Do not show the Json to user\n"
-        "If user selects to summarise all the files then use the describe_structure,list_folder_contents,list_repo_files as necessary to find all information\n"
-        "the content will be sent back to you by get_file_content you need to summarise it into the json object and send to update_code_context "
-    ),
-    tools=[
-        get_file_content,
-        update_code_context,
-        list_repo_files,
-        list_folder_contents,
-        describe_structure
-    ]
+_SUMMARIZER_INSTRUCTION = (
+    ""
+    "You are a code summarization assistant.\n"
+    "Given the full contents of a source file, return a JSON object with:\n"
+    "- file: the filename\n"
+    "- summary: a 2–3 sentence description of its purpose and logic\n"
+    "- imports: list of imports used\n"
+    "- requirements: list of external packages needed for Docker or installation\n"
+    "Do not ask user for validation of json directly call update_code_context"
+    "Only respond with a JSON object to update_code_context.Do not show the Json to user\n"
+    "If user selects to summarise all the files then call summarize_all_files once; it summarizes and stores every file itself. Use list_all_files, describe_structure, list_folder_contents, list_repo_files only for narrower requests\n"
+    "the content will be sent back to you by get_file_content you need to summarise it into the json object and send to update_code_context "
+)
+_SUMMARIZER_TOOLS = (
+    summarize_all_files,
+    get_file_content,
+    update_code_context,
+    list_all_files,
+    list_repo_files,
+    list_folder_contents,
+    describe_structure,
 )
 
 # ——— Agent: Docker —————————————————————————————————————
-dockerfile_agent = LlmAgent(
-    name="DockerfileGenerator",
-    model="gemini-2.0-flash",
-    instruction=(
-        "You are a Dockerfile generation expert and interactive deployment assistant.\n"
-        "This will be a back-and-forth session to tailor the Dockerfile to user needs.\n"
-        "The user will supply a JSON object (`context.json`) containing:\n"
-        "- file: main entry file path (e.g., `api/main.py`, `server.js`, `main.go`)\n"
-        "- summary: short description of the project\n"
-        "- imports: list of project dependencies or modules\n"
-        "- requirements: explicit packages or version pins\n"
-        "\n"
-        "**Interactive Steps**:\n"
-        "1) **Clarify requirements**:\n"
-        "   - Ask the user if they need environment variables, volume mounts, or custom build args.\n"
-        "   - Confirm desired base image variants (slim vs alpine).\n"
-        "2) **Reserve a port**:\n"
-        "   - Call `get_available_port(8000, 8100)` and tell the user which port was reserved.\n"
-        "3) **Generate Dockerfile draft**:\n"
-        "   - Detect language by file extension.\n"
-        "   - Use multi-stage builds for size optimization.\n"
-        "   - Set `WORKDIR /app`.\n"
-        "   - Copy only necessary files first to leverage layer caching.\n"
-        "   - Install dependencies: use `requirements.txt` or infer from imports.\n"
-        "   - Install system packages if needed (APT or APK).\n"
-        "   - EXPOSE the reserved port.\n"
-        "   - Set `CMD` to run the app on that port.\n"
-        "4) **Review with user**:\n"
-        "   - Present the generated Dockerfile and ask for edits (ports, env vars, healthchecks).\n"
-        "   - Apply any user edits dynamically via follow-up instructions.\n"
-        "5) **Save & deploy**:\n"
-        "   - Call `generate_dockerfile_from_context` to write the file.\n"
-        "   - Build with `build_docker_image`.\n"
-        "   - Run with `run_docker_container`.\n"
-        "6) **Report result**:\n"
-        "   - Show only success messages or structured error outputs from each tool.\n"
-        "\n"
-    ),
-    tools=[
-        get_available_port,
-        generate_dockerfile_from_context,
-        build_docker_image,
-        run_docker_container,
-        get_file_content,
-        list_repo_files,
-        list_folder_contents,
-        describe_structure,
-        run_shell_command    ]
+_DOCKERFILE_INSTRUCTION = (
+    "You are a Dockerfile generation expert and interactive deployment assistant.\n"
+    "This will be a back-and-forth session to tailor the Dockerfile to user needs.\n"
+    "Call `read_code_context()` to get the per-file records from `context.jsonl`; each contains:\n"
+    "- file: main entry file path (e.g., `api/main.py`, `server.js`, `main.go`)\n"
+    "- summary: short description of the project\n"
+    "- imports: list of project dependencies or modules\n"
+    "- requirements: explicit packages or version pins\n"
+    "\n"
+    "**Interactive Steps**:\n"
+    "1) **Clarify requirements**:\n"
+    "   - Ask the user if they need environment variables, volume mounts, or custom build args.\n"
+    "   - Confirm desired base image variants (slim vs alpine).\n"
+    "2) **Reserve a port**:\n"
+    "   - Call `get_available_port()` (or pass a range only if the user asks for one) and tell the user which port was reserved.\n"
+    "3) **Generate Dockerfile draft**:\n"
+    "   - Detect language by file extension.\n"
+    "   - Use multi-stage builds for size optimization.\n"
+    "   - Set `WORKDIR /app`.\n"
+    "   - Copy only necessary files first to leverage layer caching.\n"
+    "   - Install dependencies: use `requirements.txt` or infer from imports.\n"
+    "   - Install system packages if needed (APT or APK).\n"
+    "   - EXPOSE the reserved port.\n"
+    "   - Set `CMD` to run the app on that port.\n"
+    "4) **Review with user**:\n"
+    "   - Present the generated Dockerfile and ask for edits (ports, env vars, healthchecks).\n"
+    "   - Apply any user edits dynamically via follow-up instructions.\n"
+    "5) **Save & deploy**:\n"
+    "   - Call `generate_dockerfile_from_context` to write the file.\n"
+    "   - Build with `build_docker_image`.\n"
+    "   - Run with `run_docker_container`.\n"
+    "6) **Report result**:\n"
+    "   - Show only success messages or structured error outputs from each tool.\n"
+    "\n"
+)
+_DOCKERFILE_TOOLS = (
+    read_code_context,
+    get_available_port,
+    generate_dockerfile_from_context,
+    build_docker_image,
+    run_docker_container,
+    get_file_content,
+    list_repo_files,
+    list_folder_contents,
+    describe_structure,
+    run_shell_command,
 )
 
 
@@ -341,34 +1315,66 @@ dockerfile_agent = LlmAgent(
 
 
 # ——— Agent Definition ———————————————————————————————
-root_agent = Agent(
-    name="git_control_agent",
-    model="gemini-2.0-flash",
-    description="AI assistant to manage Git repos and project structure.",
-    instruction=(
-        "First ask the user to set the repository path then set it using set_repo_path. Do not mention names of functions\n"
-        "Available tools:\n"
-        "- Git basics: get_status, add_data, commit_data, push_changes, pull_changes, rollback_last_commit\n" 
-        "- Branching: create_branch, switch_branch, delete_branch\n"
-        "- Stash: stash_changes, apply_stash\n"
-        "- Logs & tips: view_log, recommend_action\n"
-        "- File/Folder: list_repo_files, list_folder_contents, describe_structure, update_readme\n"
-        "- Shell execution: run_shell_command(cmd)\n"
-        "update_readme should be run when new data is added\n"
-        "Always present most of the structure or data in highly redable format \n"
-        "**If there is a requirement that are not in tools then directly tell the user the commands to do it from cmd and if user accepts then run the command using run_shell_command**\n"
-        "Use only what the user asks, in the right order (e.g., add_data() before commit_data())."
-    ),
-    tools=[
-        set_repo_path,
-        run_shell_command,
-        # Git tools
-        get_status, add_data, commit_data, push_changes, pull_changes,
-        rollback_last_commit, create_branch, switch_branch, delete_branch,
-        stash_changes, apply_stash, view_log, recommend_action,
-        # File/Folder
-        list_repo_files, list_folder_contents, describe_structure, update_readme,
-        # Summarization
-    ],
-    sub_agents=[summarizer,dockerfile_agent]
-)
\ No newline at end of file
+_ROOT_INSTRUCTION = (
+    "First ask the user to set the repository path then set it using set_repo_path. Do not mention names of functions\n"
+    "Available tools:\n"
+    "- Git basics: get_status, add_data, commit_data (include_untracked=False commits only tracked files), push_changes, pull_changes, rollback_last_commit\n"
+    "- Branching: create_branch, switch_branch, delete_branch\n"
+    "- Stash: stash_changes, apply_stash\n"
+    "- Logs & tips: view_log, recommend_action, snapshot (status + log + files at once)\n"
+    "- Batched reads: git_call_many(commands) runs several read-only git commands (status, log, diff, show, branch, rev-parse, ls-files, for-each-ref) at once\n"
+    "- File/Folder: list_repo_files, list_folder_contents, describe_structure, update_readme\n"
+    "- Shell execution: run_shell_command(cmd) runs one command or a `|` pipeline (no redirects or chaining); allowed programs: "
+    + ", ".join(sorted(SHELL_ALLOWED)) + "\n"
+    "update_readme should be run when new data is added\n"
+    "Always present most of the structure or data in highly redable format \n"
+    "**If there is a requirement that are not in tools then directly tell the user the commands to do it from cmd and if user accepts then run the command using run_shell_command**\n"
+    "Use only what the user asks, in the right order (e.g., add_data() before commit_data())."
+)
+_ROOT_TOOLS = (
+    set_repo_path,
+    run_shell_command,
+    # Git tools
+    get_status, add_data, commit_data, push_changes, pull_changes,
+    rollback_last_commit, create_branch, switch_branch, delete_branch,
+    stash_changes, apply_stash, view_log, recommend_action, snapshot, git_call_many,
+    # File/Folder
+    list_repo_files, list_folder_contents, describe_structure, update_readme,
+    # Summarization
+)
+
+# ——— Agent construction ———
+# google.adk is heavy to import; the agents are built on first access
+# (PEP 562), so processes that only use the tools never load it
+_AGENT_NAMES = frozenset({"summarizer", "dockerfile_agent", "root_agent"})
+
+def _build_agents() -> dict:
+    from google.adk.agents import Agent, LlmAgent
+    summarizer = LlmAgent(
+        name="Summarizer",
+        model="gemini-2.0-flash",
+        instruction=_SUMMARIZER_INSTRUCTION,
+        tools=_SUMMARIZER_TOOLS
+    )
+    dockerfile_agent = LlmAgent(
+        name="DockerfileGenerator",
+        model="gemini-2.0-flash",
+        instruction=_DOCKERFILE_INSTRUCTION,
+        tools=_DOCKERFILE_TOOLS
+    )
+    root_agent = Agent(
+        name="git_control_agent",
+        model="gemini-2.0-flash",
+        description="AI assistant to manage Git repos and project structure.",
+        instruction=_ROOT_INSTRUCTION,
+        tools=_ROOT_TOOLS,
+        sub_agents=[summarizer,dockerfile_agent]
+    )
+    return {"summarizer": summarizer, "dockerfile_agent": dockerfile_agent, "root_agent": root_agent}
+
+def __getattr__(name: str):
+    if name in _AGENT_NAMES:
+        agents = _build_agents()
+        globals().update(agents)  # later lookups are plain module attributes
+        return agents[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file